@@ -1,11 +1,14 @@
 from autogen_agentchat.agents import AssistantAgent
+import asyncio
 from autogen_agentchat.base import TaskResult
 from autogen_agentchat.teams import RoundRobinGroupChat
 from autogen_ext.models.openai import OpenAIChatCompletionClient
-from autogen_ext.tools.mcp import SseMcpToolAdapter, SseServerParams
+from autogen_ext.tools.mcp import StreamableHttpMcpToolAdapter, StreamableHttpServerParams
 import click
+from contextlib import aclosing
 from dataclasses import dataclass
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 import logging
 import os
 from pydantic import BaseModel
@@ -13,7 +16,6 @@ from typing import Any, Dict
 import uuid
 import time
 
-from util.llm_utils import get_llm_model
 import uvicorn
 
 import sys
@@ -24,6 +26,11 @@ sys.path.append(str(Path(__file__).parent.parent))
 from dotenv import load_dotenv
 load_dotenv()
 
+# util modules read their settings at import, so import them after load_dotenv()
+from server.llm_cache import get_llm_cache  # noqa: E402
+from util.llm_utils import get_llm_model  # noqa: E402
+from util.telemetry import init_newrelic  # noqa: E402
+
 
 def get_tool_hostname() -> str:
     return os.getenv("TOOL_HOSTNAME", "localhost")
@@ -34,13 +41,54 @@ def get_tool_port() -> int:
 
 
 def get_tool_url() -> str:
-    return f"http://{get_tool_hostname()}:{get_tool_port()}/sse"
+    return f"http://{get_tool_hostname()}:{get_tool_port()}/mcp"
 
 
 def get_openai_base_url() -> str:
     return os.getenv("OPENAI_BASE_URL", "")
 
 
+SYSTEM_MESSAGE = (
+    "You are a helpful AI assistant with access to the following tools:\n"
+    "1. calculator - Perform arithmetic operations (add, subtract, multiply, divide)\n"
+    "2. get_weather - Get current weather information for any city\n"
+    "3. read_file - Read contents of files from the data directory\n\n"
+    "Analyze the user's request and use the appropriate tool(s) to help them. "
+    "You can use multiple tools if needed to complete the task."
+)
+
+# Connection settings for the remote MCP service, shared by every agent
+SERVER_PARAMS = StreamableHttpServerParams(
+    url=get_tool_url(),
+    headers={"Content-Type": "application/json"},
+    timeout=5,  # Connection timeout in seconds
+)
+
+
+def extract_response_text(result: TaskResult) -> str:
+    """Return the text of the last message produced by an agent run."""
+    response_text = ""
+    if hasattr(result, "messages") and result.messages:
+        last_message = result.messages[-1]
+        content = getattr(last_message, "content", None)
+
+        if content is not None:
+            if isinstance(content, str):
+                response_text = content
+            elif isinstance(content, list):
+                # Handle content blocks
+                text_parts = []
+                for block in content:
+                    if isinstance(block, dict) and block.get("type") == "text":
+                        text_parts.append(block.get("text", ""))
+                    elif isinstance(block, str):
+                        text_parts.append(block)
+                response_text = "".join(text_parts) if text_parts else str(content)
+            else:
+                response_text = str(content)
+    return response_text
+
+
 @dataclass
 class ChatData(BaseModel):
     message: str
@@ -59,20 +107,16 @@ def main(port: int):
     logger.debug("Starting main() entrypoint", extra={"port": port})
 
     app = FastAPI(title="Chat API")
+    llm_cache = get_llm_cache()
 
     async def create_agent(request_id: str) -> AssistantAgent:
-        start_ts = time.time()
-        logger.debug("[create_agent] Begin", extra={"request_id": request_id})
-        # Create server params for the remote MCP service
-        server_params = SseServerParams(
-            url=get_tool_url(),
-            headers={"Content-Type": "application/json"},
-            timeout=5,  # Connection timeout in seconds
-        )
-        logger.debug("[create_agent] Connecting to MCP tools", extra={"request_id": request_id, "tool_url": get_tool_url()})
-        calculator_adapter = await SseMcpToolAdapter.from_server_params(server_params, "calculator")
-        weather_adapter = await SseMcpToolAdapter.from_server_params(server_params, "get_weather")
-        file_reader_adapter = await SseMcpToolAdapter.from_server_params(server_params, "read_file")
+        start_ts = time.perf_counter()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[create_agent] Begin", extra={"request_id": request_id})
+            logger.debug("[create_agent] Connecting to MCP tools", extra={"request_id": request_id, "tool_url": SERVER_PARAMS.url})
+        calculator_adapter = await StreamableHttpMcpToolAdapter.from_server_params(SERVER_PARAMS, "calculator")
+        weather_adapter = await StreamableHttpMcpToolAdapter.from_server_params(SERVER_PARAMS, "get_weather")
+        file_reader_adapter = await StreamableHttpMcpToolAdapter.from_server_params(SERVER_PARAMS, "read_file")
         logger.info(
             "[create_agent] Tools initialized",
             extra={"request_id": request_id, "tools": ["calculator", "get_weather", "read_file"]},
@@ -100,17 +144,11 @@ def main(port: int):
             name="assistant",
             model_client=model_client,
             tools=tools, # type: ignore
-            system_message=(
-                "You are a helpful AI assistant with access to the following tools:\n"
-                "1. calculator - Perform arithmetic operations (add, subtract, multiply, divide)\n"
-                "2. get_weather - Get current weather information for any city\n"
-                "3. read_file - Read contents of files from the data directory\n\n"
-                "Analyze the user's request and use the appropriate tool(s) to help them. "
-                "You can use multiple tools if needed to complete the task."
-            ),
+            system_message=SYSTEM_MESSAGE,
         )
-        elapsed = time.time() - start_ts
-        logger.debug("[create_agent] Complete", extra={"request_id": request_id, "elapsed_ms": int(elapsed * 1000)})
+        if logger.isEnabledFor(logging.DEBUG):
+            elapsed = time.perf_counter() - start_ts
+            logger.debug("[create_agent] Complete", extra={"request_id": request_id, "elapsed_ms": int(elapsed * 1000)})
         return agent
 
 
@@ -118,55 +156,65 @@ def main(port: int):
     async def health_check():
         return {"status": "healthy"}
 
-    @app.post("/chat")
+    @app.post("/chat", response_class=ORJSONResponse)
     async def chat(request: ChatData):
         request_id = str(uuid.uuid4())
-        t0 = time.time()
+        t0 = time.perf_counter()
         # Avoid using reserved LogRecord attribute names (e.g. 'message') in 'extra'
         logger.info("[chat] Received request", extra={"request_id": request_id, "user_message": request.message})
-        agent = await create_agent(request_id)
-
-        # Run the agent with the user's message
-        logger.debug("[chat] Starting agent.run", extra={"request_id": request_id})
-        result = await agent.run(task=request.message)
-        logger.debug("[chat] agent.run completed", extra={"request_id": request_id})
-        # Log only lightweight metadata about the TaskResult to prevent large payloads
-        logger.info(
-            "chat result from agent run",
-            extra={
-                "request_id": request_id,
-                "result_type": result.__class__.__name__,
-                "message_count": len(getattr(result, "messages", []) or []),
-            },
-        )
-
-        # Extract the response
-        response_text = ""
-        if hasattr(result, "messages") and result.messages:
-            last_message = result.messages[-1]
-            content = getattr(last_message, "content", None)
-
-            if content is not None:
-                if isinstance(content, str):
-                    response_text = content
-                elif isinstance(content, list):
-                    # Handle content blocks
-                    text_parts = []
-                    for block in content:
-                        if isinstance(block, dict) and block.get("type") == "text":
-                            text_parts.append(block.get("text", ""))
-                        elif isinstance(block, str):
-                            text_parts.append(block)
-                    response_text = "".join(text_parts) if text_parts else str(content)
+        # Semantic lookups embed the message, which is CPU-bound; keep those off the
+        # loop. Exact matching is a hash and a dict lookup, so it runs inline.
+        cached_response = None
+        if llm_cache is not None:
+            if llm_cache.semantic:
+                cached_response = await asyncio.to_thread(
+                    llm_cache.get, request.message
+                )
+            else:
+                cached_response = llm_cache.get(request.message)
+        if cached_response is not None:
+            logger.info("[chat] Serving cached response", extra={"request_id": request_id})
+            response_text = cached_response
+        else:
+            agent = await create_agent(request_id)
+
+            # Run the agent with the user's message
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[chat] Starting agent.run_stream", extra={"request_id": request_id})
+            # The TaskResult is the stream's last item; aclosing() finalizes the
+            # generator here rather than leaving it to the loop's finalizer
+            result = None
+            async with aclosing(agent.run_stream(task=request.message)) as stream:
+                async for item in stream:
+                    if isinstance(item, TaskResult):
+                        result = item
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[chat] agent.run_stream completed", extra={"request_id": request_id})
+            # Log only lightweight metadata about the TaskResult to prevent large payloads
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "chat result from agent run",
+                    extra={
+                        "request_id": request_id,
+                        "result_type": result.__class__.__name__,
+                        "message_count": len(getattr(result, "messages", []) or []),
+                    },
+                )
+
+            response_text = extract_response_text(result) if result is not None else ""
+            if llm_cache is not None and response_text:
+                if llm_cache.semantic:
+                    await asyncio.to_thread(
+                        llm_cache.set, request.message, response_text
+                    )
                 else:
-                    response_text = str(content)
+                    llm_cache.set(request.message, response_text)
 
-        duration_ms = int((time.time() - t0) * 1000)
+        duration_ms = int((time.perf_counter() - t0) * 1000)
         logger.info(
             "[chat] Completed",
             extra={
                 "request_id": request_id,
-                "user_message": request.message,
                 "response": response_text,
                 "duration_ms": duration_ms,
             },
@@ -178,10 +226,7 @@ def main(port: int):
 
 
 if __name__ == "__main__":
-    import newrelic.agent
-
-    # Initialize New Relic Python Agent
-    newrelic.agent.initialize("../newrelic.ini")
-    newrelic.agent.register_application(timeout=10)
+    # Initialize New Relic Python Agent when NEW_RELIC_ENABLED=1
+    init_newrelic("../newrelic.ini")
 
     main()
\ No newline at end of file
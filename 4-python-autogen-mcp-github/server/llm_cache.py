@@ -0,0 +1,156 @@
+"""Response cache placed in front of the agent for the ``/chat`` endpoint.
+
+Lookups match the normalized message exactly. When semantic matching is also
+enabled and the optional ``sentence-transformers`` package is installed, misses
+fall back to a cosine similarity search over the embeddings of cached messages,
+so near-duplicate questions reuse a previous answer instead of calling the LLM
+and tools again. Semantic matching can return the answer to a similar but
+different question (e.g. "12*7" vs "12*8"), so it is a separate opt-in.
+
+Embedding is CPU-bound; when ``semantic`` is true, callers on an event loop
+should run ``get``/``set`` in a worker thread. Both methods are safe to call
+concurrently.
+
+Environment variables:
+  LLM_CACHE_ENABLED          - set to ``1`` to enable the cache (default off).
+  LLM_CACHE_SEMANTIC         - set to ``1`` to also match by embedding similarity
+                               (default off; needs LLM_CACHE_ENABLED=1).
+  LLM_CACHE_MAX_SIZE         - maximum number of cached responses (default 256).
+  LLM_CACHE_TTL_SECONDS      - lifetime of a cached response (default 300).
+  LLM_CACHE_SIMILARITY       - cosine similarity threshold (default 0.92).
+  LLM_CACHE_EMBEDDING_MODEL  - sentence-transformers model used for embeddings
+                               (default 'sentence-transformers/all-MiniLM-L6-v2').
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Optional, Tuple
+
+from util.telemetry import record_custom_metric
+
+logger = logging.getLogger("server.llm_cache")
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def _normalize(message: str) -> str:
+    return message.strip().lower()
+
+
+class LLMCache:
+    """LRU cache of agent responses with TTL expiry and similarity fallback."""
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        ttl_seconds: float = 300.0,
+        similarity_threshold: float = 0.92,
+        embedding_model: Optional[str] = None,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        # key -> (response, embedding, expires_at)
+        self._entries: "OrderedDict[str, Tuple[str, Any, float]]" = OrderedDict()
+        # Guards _entries; embeddings are computed outside the lock
+        self._lock = threading.Lock()
+        self._model = self._load_model(embedding_model) if embedding_model else None
+        # Memoize embeddings so a miss followed by set() only encodes once.
+        self._embed = lru_cache(maxsize=128)(self._encode)
+
+    @staticmethod
+    def _load_model(name: str) -> Any:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            logger.info(
+                "[llm_cache] sentence-transformers not installed; "
+                "using exact matching only"
+            )
+            return None
+        logger.info(
+            "[llm_cache] Loading embedding model", extra={"embedding_model": name}
+        )
+        return SentenceTransformer(name)
+
+    @property
+    def semantic(self) -> bool:
+        """Whether lookups embed messages, which is CPU-bound."""
+        return self._model is not None
+
+    def _encode(self, normalized: str) -> Any:
+        if self._model is None:
+            return None
+        return self._model.encode(normalized, normalize_embeddings=True)
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [
+            key
+            for key, (_, _, expires_at) in self._entries.items()
+            if expires_at <= now
+        ]
+        for key in expired:
+            del self._entries[key]
+
+    def get(self, message: str) -> Optional[str]:
+        """Return a cached response for ``message`` or ``None`` on a miss."""
+        normalized = _normalize(message)
+        key = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            entry = self._entries.get(key)
+            search = entry is None and self._model is not None and bool(self._entries)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if search:
+            embedding = self._embed(normalized)
+            best_score = self.similarity_threshold
+            with self._lock:
+                for candidate_key, candidate in self._entries.items():
+                    score = float(embedding @ candidate[1])
+                    if score >= best_score:
+                        best_score, key, entry = score, candidate_key, candidate
+                if entry is not None:
+                    self._entries.move_to_end(key)
+
+        if entry is None:
+            record_custom_metric("Custom/LLMCache/Misses", 1)
+            return None
+
+        record_custom_metric("Custom/LLMCache/Hits", 1)
+        return entry[0]
+
+    def set(self, message: str, response: str) -> None:
+        """Store ``response`` as the answer to ``message``."""
+        normalized = _normalize(message)
+        key = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        embedding = self._embed(normalized)
+        with self._lock:
+            expires_at = time.monotonic() + self.ttl_seconds
+            self._entries[key] = (response, embedding, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """Build the cache from the environment, or return ``None`` when disabled."""
+    if os.getenv("LLM_CACHE_ENABLED", "0") != "1":
+        return None
+    embedding_model = None
+    if os.getenv("LLM_CACHE_SEMANTIC", "0") == "1":
+        embedding_model = os.getenv(
+            "LLM_CACHE_EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL
+        )
+    return LLMCache(
+        max_size=int(os.getenv("LLM_CACHE_MAX_SIZE", 256)),
+        ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", 300)),
+        similarity_threshold=float(os.getenv("LLM_CACHE_SIMILARITY", 0.92)),
+        embedding_model=embedding_model,
+    )
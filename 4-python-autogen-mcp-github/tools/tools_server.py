@@ -1,13 +1,24 @@
-from util.llm_utils import query_llm
 import click
+import codecs
 import os
 from mcp.server.fastmcp import FastMCP, Context
 import sys
 from pathlib import Path
-import requests
+import anyio
+import asyncio
+import httpx
 import logging
+import operator
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
 import uuid
 import time
+from time import perf_counter_ns
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 sys.path.append(str(Path(__file__).parent.parent))
 
@@ -15,20 +26,128 @@ sys.path.append(str(Path(__file__).parent.parent))
 from dotenv import load_dotenv
 load_dotenv()
 
-mcp = FastMCP("Tools service")
+# util modules read their settings at import, so import them after load_dotenv()
+from util.telemetry import (  # noqa: E402
+    add_custom_attributes,
+    function_trace,
+    init_newrelic,
+    record_custom_metric,
+)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
+# The tools keep no per-client state, so skip MCP session tracking
+mcp = FastMCP("Tools service", stateless_http=True)
 if not logging.getLogger().handlers:
     logging.basicConfig(
-        level=os.getenv("LOG_LEVEL", "INFO"),
+        level=LOG_LEVEL,
         format="%(asctime)s | %(levelname)s | tools | %(message)s",
     )
 logger = logging.getLogger("tools")
 logger.debug("Tools MCP server initializing")
 
 
+WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
+WEATHER_CACHE_TTL_MINUTES = float(os.getenv("WEATHER_CACHE_TTL_MINUTES", 10))
+
+# Shared async HTTP client so OpenWeather calls reuse pooled keep-alive connections
+# without blocking the event loop. Created lazily inside the running loop.
+_weather_client: Optional[httpx.AsyncClient] = None
+# In-flight OpenWeather lookups keyed by city
+_inflight: Dict[str, "asyncio.Future[str]"] = {}
+
+
+class WeatherCache:
+    """Small TTL cache of weather lookups keyed by city.
+
+    Entries are tagged with a kind so failed lookups ("negative" entries) can be
+    remembered briefly alongside successful ones and returned without calling
+    OpenWeather again.
+    """
+
+    POSITIVE = "positive"
+    NEGATIVE = "negative"
+
+    def __init__(self, max_size: int = 1024) -> None:
+        self.max_size = max_size
+        # city -> (kind, value, expires_at)
+        self._entries: Dict[str, Tuple[str, str, float]] = {}
+
+    def get(self, city: str) -> Optional[Tuple[str, str]]:
+        """Return ``(kind, value)`` for a live entry, or ``None`` on a miss."""
+        entry = self._entries.get(city)
+        if entry is None:
+            return None
+        kind, value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[city]
+            return None
+        return kind, value
+
+    def set(self, city: str, result: str, ttl: float) -> None:
+        """Remember a successful lookup for ``ttl`` seconds."""
+        self._store(city, self.POSITIVE, result, ttl)
+
+    def set_negative(self, city: str, error: str, ttl: float = 60.0) -> None:
+        """Remember a failed lookup for ``ttl`` seconds."""
+        self._store(city, self.NEGATIVE, error, ttl)
+
+    def _store(self, city: str, kind: str, value: str, ttl: float) -> None:
+        self._entries.pop(city, None)
+        self._entries[city] = (kind, value, time.monotonic() + ttl)
+        if len(self._entries) > self.max_size:
+            # Dicts keep insertion order, so the first key is the oldest entry
+            del self._entries[next(iter(self._entries))]
+
+
+weather_cache = WeatherCache()
+
+
+def _norm(city: str) -> str:
+    """Normalize a city name so equivalent spellings share cache entries."""
+    return " ".join(city.strip().casefold().split())
+
+
+def get_weather_client() -> httpx.AsyncClient:
+    global _weather_client
+    if _weather_client is None:
+        limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        _weather_client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(retries=2, limits=limits),
+            headers={"User-Agent": "mcp-tools-service"},
+            timeout=httpx.Timeout(5.0, connect=2.0),
+        )
+    return _weather_client
+
+
+# Directory served by read_file, resolved once since it never moves
+_DATA_DIR = (Path(__file__).parent.parent / "data").resolve()
+_DATA_DIR.mkdir(exist_ok=True)
+# Larger files are truncated so one read cannot load an arbitrary file into memory.
+# Clamped to at least 1 byte, since f.read() treats 0 or less as "read everything".
+READ_FILE_MAX_BYTES = max(1, int(os.getenv("READ_FILE_MAX_BYTES", 1024 * 1024)))
+
+
 def get_openai_base_url() -> str:
     return os.getenv("OPENAI_BASE_URL", "http://localhost:1234/v1/")
 
 
+# Calculator operations, looked up by name so only the requested one is evaluated
+_OPS: Dict[str, Callable[[int, int], Any]] = {
+    "add": operator.add,
+    "subtract": operator.sub,
+    "multiply": operator.mul,
+    "divide": lambda a, b: a / b if b != 0 else "Error: Division by zero",
+}
+
+
+@lru_cache(maxsize=1024)
+def _calc(a: int, b: int, operation: str) -> Any:
+    op = _OPS.get(operation)
+    return op(a, b) if op is not None else "Error: Invalid operation"
+
+
 @mcp.tool("calculator")
 def calculator(a: int, b: int, operation: str, ctx: Context) -> str:
     """Perform basic arithmetic operations.
@@ -41,26 +160,54 @@ def calculator(a: int, b: int, operation: str, ctx: Context) -> str:
     Returns:
         Result of the operation as a string
     """
-    request_id = str(uuid.uuid4())
-    t0 = time.time()
-    logger.debug("[calculator] start", extra={"request_id": request_id, "a": a, "b": b, "operation": operation})
-    operations = {
-        "add": a + b,
-        "subtract": a - b,
-        "multiply": a * b,
-        "divide": a / b if b != 0 else "Error: Division by zero",
-    }
-    result = operations.get(operation.lower(), "Error: Invalid operation")
-    elapsed_ms = int((time.time() - t0) * 1000)
-    logger.info(
-        "[calculator] complete",
-        extra={"request_id": request_id, "a": a, "b": b, "operation": operation, "result": result, "elapsed_ms": elapsed_ms},
-    )
+    request_id = uuid.uuid4().hex
+    t0 = perf_counter_ns()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[calculator] start", extra={"request_id": request_id, "a": a, "b": b, "operation": operation})
+    result = _calc(a, b, operation.lower())
+    if logger.isEnabledFor(logging.INFO):
+        elapsed_ms = (perf_counter_ns() - t0) // 1_000_000
+        logger.info(
+            "[calculator] complete",
+            extra={"request_id": request_id, "a": a, "b": b, "operation": operation, "result": result, "elapsed_ms": elapsed_ms},
+        )
     return str(result)
 
 
+async def fetch_weather(city: str, key: str, request_id: str, t0: int) -> str:
+    """Query OpenWeather for ``city`` and format the result for the agent."""
+    try:
+        params = {"q": city, "appid": OPENWEATHER_API_KEY, "units": "metric"}
+        with function_trace("openweather.get"):
+            response = await get_weather_client().get(WEATHER_URL, params=params)
+        response.raise_for_status()
+        data = json_loads(response.content)
+        weather = data["weather"][0]["description"]
+        temp = data["main"]["temp"]
+        feels_like = data["main"]["feels_like"]
+        humidity = data["main"]["humidity"]
+        result = f"Weather in {city}: {weather}, Temperature: {temp}°C (feels like {feels_like}°C), Humidity: {humidity}%"
+        weather_cache.set(key, result, WEATHER_CACHE_TTL_MINUTES * 60)
+        if logger.isEnabledFor(logging.INFO):
+            elapsed_ms = (perf_counter_ns() - t0) // 1_000_000
+            logger.info(
+                "[get_weather] complete",
+                extra={"request_id": request_id, "city": city, "weather": weather, "temp": temp, "elapsed_ms": elapsed_ms},
+            )
+        return result
+    except httpx.HTTPError as e:
+        logger.error("[get_weather] request_error", extra={"request_id": request_id, "city": city, "error": str(e)})
+        error = f"Error fetching weather data for {city}. Please check the city name."
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        logger.error("[get_weather] parse_error", extra={"request_id": request_id, "city": city, "error": str(e)})
+        error = f"Error parsing weather data for {city}."
+    weather_cache.set_negative(key, error)
+    record_custom_metric("Custom/Weather/NegativeCacheStore", 1)
+    return error
+
+
 @mcp.tool("get_weather")
-def get_weather(city: str, ctx: Context) -> str:
+async def get_weather(city: str, ctx: Context) -> str:
     """Get current weather information for a city.
     
     Args:
@@ -69,35 +216,36 @@ def get_weather(city: str, ctx: Context) -> str:
     Returns:
         Weather information as a string
     """
-    request_id = str(uuid.uuid4())
-    t0 = time.time()
-    logger.debug("[get_weather] start", extra={"request_id": request_id, "city": city})
-    api_key = os.getenv("OPENWEATHER_API_KEY")
-    if not api_key:
+    request_id = uuid.uuid4().hex
+    t0 = perf_counter_ns()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[get_weather] start", extra={"request_id": request_id, "city": city})
+    if not OPENWEATHER_API_KEY:
         logger.error("[get_weather] missing API key", extra={"request_id": request_id})
         raise ValueError("Weather service not configured. OPENWEATHER_API_KEY environment variable is required.")
-    try:
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        weather = data["weather"][0]["description"]
-        temp = data["main"]["temp"]
-        feels_like = data["main"]["feels_like"]
-        humidity = data["main"]["humidity"]
-        result = f"Weather in {city}: {weather}, Temperature: {temp}°C (feels like {feels_like}°C), Humidity: {humidity}%"
-        elapsed_ms = int((time.time() - t0) * 1000)
-        logger.info(
-            "[get_weather] complete",
-            extra={"request_id": request_id, "city": city, "weather": weather, "temp": temp, "elapsed_ms": elapsed_ms},
-        )
-        return result
-    except requests.exceptions.RequestException as e:
-        logger.error("[get_weather] request_error", extra={"request_id": request_id, "city": city, "error": str(e)})
-        return f"Error fetching weather data for {city}. Please check the city name."
-    except KeyError as e:
-        logger.error("[get_weather] parse_error", extra={"request_id": request_id, "city": city, "error": str(e)})
-        return f"Error parsing weather data for {city}."
+
+    key = _norm(city)
+    cached = weather_cache.get(key)
+    if cached is not None:
+        kind, value = cached
+        add_custom_attributes([("weather.cache_hit", True), ("weather.cache_kind", kind)])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[get_weather] cache_hit", extra={"request_id": request_id, "city": city, "kind": kind})
+        return value
+
+    # Concurrent lookups for the same city share a single upstream request. The
+    # lookup and registration below do not yield to the loop, so no lock is needed.
+    lookup = _inflight.get(key)
+    if lookup is None:
+        lookup = asyncio.ensure_future(fetch_weather(city, key, request_id, t0))
+        _inflight[key] = lookup
+        lookup.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        record_custom_metric("Custom/Weather/Coalesced", 1)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[get_weather] coalesced", extra={"request_id": request_id, "city": city})
+    # Shield so a cancelled caller does not cancel the lookup other callers await
+    return await asyncio.shield(lookup)
 
 
 @mcp.tool("read_file")
@@ -110,49 +258,72 @@ def read_file(filename: str, ctx: Context) -> str:
     Returns:
         Contents of the file as a string
     """
-    request_id = str(uuid.uuid4())
-    t0 = time.time()
-    logger.debug("[read_file] start", extra={"request_id": request_id, "filename": filename})
-    data_dir = Path(__file__).parent.parent / "data"
-    data_dir.mkdir(exist_ok=True)
-    file_path = data_dir / filename
+    request_id = uuid.uuid4().hex
+    t0 = perf_counter_ns()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[read_file] start", extra={"request_id": request_id, "file_name": filename})
     try:
-        file_path = file_path.resolve()
-        if not str(file_path).startswith(str(data_dir.resolve())):
-            logger.warning("[read_file] path_outside_data_dir", extra={"request_id": request_id, "filename": filename})
+        file_path = (_DATA_DIR / filename).resolve()
+        if not file_path.is_relative_to(_DATA_DIR):
+            logger.warning("[read_file] path_outside_data_dir", extra={"request_id": request_id, "file_name": filename})
             return "Error: Access denied. File must be in the data directory."
         if not file_path.exists():
-            logger.info("[read_file] not_found", extra={"request_id": request_id, "filename": filename})
+            logger.info("[read_file] not_found", extra={"request_id": request_id, "file_name": filename})
             return f"Error: File '{filename}' not found in data directory."
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        elapsed_ms = int((time.time() - t0) * 1000)
-        logger.info(
-            "[read_file] complete",
-            extra={"request_id": request_id, "filename": filename, "size": len(content), "elapsed_ms": elapsed_ms},
-        )
+        size = file_path.stat().st_size
+        # Binary mode skips newline translation; at most READ_FILE_MAX_BYTES are read
+        with open(file_path, "rb") as f:
+            data = f.read(READ_FILE_MAX_BYTES)
+        truncated = size > READ_FILE_MAX_BYTES
+        if truncated:
+            # The cut may split a multi-byte character; an incremental decoder holds
+            # back only that partial tail and still rejects invalid bytes elsewhere
+            content = codecs.getincrementaldecoder("utf-8")().decode(data, final=False)
+            content += f"\n[truncated: showing the first {READ_FILE_MAX_BYTES} of {size} bytes]"
+        else:
+            content = data.decode("utf-8")
+        if logger.isEnabledFor(logging.INFO):
+            elapsed_ms = (perf_counter_ns() - t0) // 1_000_000
+            logger.info(
+                "[read_file] complete",
+                extra={
+                    "request_id": request_id,
+                    "file_name": filename,
+                    "size": size,
+                    "truncated": truncated,
+                    "elapsed_ms": elapsed_ms,
+                },
+            )
         return content
     except Exception as e:
-        logger.error("[read_file] error", extra={"request_id": request_id, "filename": filename, "error": str(e)})
+        logger.error("[read_file] error", extra={"request_id": request_id, "file_name": filename, "error": str(e)})
         return f"Error reading file '{filename}': {str(e)}"
 
 
+async def serve() -> None:
+    """Serve MCP over streamable HTTP and release the shared HTTP client on shutdown."""
+    global _weather_client
+    try:
+        await mcp.run_streamable_http_async()
+    finally:
+        if _weather_client is not None:
+            await _weather_client.aclose()
+            _weather_client = None
+
+
 @click.command()
-@click.option("--port", default=8090, help="Port to listen on for SSE")
+@click.option("--port", default=8090, help="Port to listen on for MCP over streamable HTTP")
 def main(port: int):
     """Run the FastMCP server."""
     logger.info("[startup] tools server starting", extra={"port": port})
     mcp.settings.port = port
-    t0 = time.time()
-    mcp.run('sse')
-    logger.info("[shutdown] tools server stopped", extra={"elapsed_ms": int((time.time() - t0) * 1000)})
+    t0 = perf_counter_ns()
+    anyio.run(serve)
+    logger.info("[shutdown] tools server stopped", extra={"elapsed_ms": (perf_counter_ns() - t0) // 1_000_000})
 
 
 if __name__ == "__main__":
-    import newrelic.agent
-    
-    # Initialize New Relic Python Agent
-    newrelic.agent.initialize("../newrelic.ini")
-    newrelic.agent.register_application(timeout=10)
-    
+    # Initialize New Relic Python Agent when NEW_RELIC_ENABLED=1
+    init_newrelic("../newrelic.ini")
+
     main()
\ No newline at end of file
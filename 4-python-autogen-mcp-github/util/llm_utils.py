@@ -10,18 +10,39 @@ Environment variables:
                        with "models.read" scope) or the GitHub Models token.
   OPENAI_BASE_URL   - (optional) override base URL. Defaults to the GitHub
                        Models inference endpoint.
+
+The variables are read once at import, so load any .env file before importing
+this module.
 """
 
 from typing import Optional
 import os
+import threading
 from openai import OpenAI
 
 GITHUB_MODELS_BASE_URL = "https://models.inference.ai.azure.com"
 
+# Default to a broadly capable / cost effective model. Users can override.
+_MODEL = os.getenv("LLM_MODEL", "gpt-5-nano")
+_BASE_URL = os.getenv("OPENAI_BASE_URL", GITHUB_MODELS_BASE_URL)
+_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# Shared client so its HTTP connection pool is reused across queries
+_client: Optional[OpenAI] = None
+_client_lock = threading.Lock()
+
 
 def get_llm_model() -> str:
-    # Default to a broadly capable / cost effective model. Users can override.
-    return os.getenv("LLM_MODEL", "gpt-5-nano")
+    return _MODEL
+
+
+def _get_client() -> OpenAI:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(base_url=_BASE_URL, api_key=_API_KEY)
+    return _client
 
 
 def query_llm(
@@ -37,11 +58,7 @@ def query_llm(
     if not messages:
         return ""
 
-    client = OpenAI(
-        base_url=os.getenv("OPENAI_BASE_URL", GITHUB_MODELS_BASE_URL),
-        api_key=os.getenv("OPENAI_API_KEY"),
-    )
-    completion = client.chat.completions.create(
+    completion = _get_client().chat.completions.create(
         model=get_llm_model(),
         messages=messages,
         temperature=0.7,
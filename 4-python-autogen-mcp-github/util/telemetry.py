@@ -0,0 +1,46 @@
+"""Optional New Relic instrumentation shared by the server and tools processes.
+
+Importing the New Relic agent patches many libraries and noticeably slows
+process start, so it is only imported when instrumentation is switched on.
+With it off, the helpers below do nothing.
+
+Environment variables:
+  NEW_RELIC_ENABLED - set to '1' to load the agent (default off). Read once at
+                      import, so load any .env file before importing this module.
+"""
+
+import os
+from contextlib import nullcontext
+from typing import Any, ContextManager, Iterable, Tuple
+
+NEW_RELIC_ENABLED = os.getenv("NEW_RELIC_ENABLED", "0") == "1"
+
+if NEW_RELIC_ENABLED:
+    import newrelic.agent as _newrelic
+else:
+    _newrelic = None
+
+
+def init_newrelic(config_file: str) -> None:
+    """Initialize the agent from ``config_file`` and register the application."""
+    if _newrelic is not None:
+        _newrelic.initialize(config_file)
+        _newrelic.register_application(timeout=10)
+
+
+def record_custom_metric(name: str, value: float) -> None:
+    # Record against the application so metrics from worker threads (outside a
+    # transaction) are not dropped
+    if _newrelic is not None:
+        _newrelic.record_custom_metric(name, value, application=_newrelic.application())
+
+
+def add_custom_attributes(items: Iterable[Tuple[str, Any]]) -> None:
+    if _newrelic is not None:
+        _newrelic.add_custom_attributes(items)
+
+
+def function_trace(name: str) -> ContextManager[Any]:
+    if _newrelic is not None:
+        return _newrelic.FunctionTrace(name)
+    return nullcontext()
@@ -2,9 +2,13 @@
 import newrelic.agent
 import os
 import requests
+import secrets
+import threading
+import time
 import urllib.parse
+from collections import OrderedDict
 from flask import Flask, render_template, jsonify, request, session
-import json
+import orjson
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
@@ -12,6 +16,36 @@ app.secret_key = os.urandom(24)
 # initialize the New Relic Python agent
 newrelic.agent.initialize('newrelic.ini')
 
+# reuse one HTTP session so calls to the backend share pooled connections
+_SESSION = requests.Session()
+
+# per-user data (activity lists, prompts, chat content) is kept server-side,
+# keyed by a short id stored in the signed session cookie. The store is an LRU
+# bounded by size, and entries idle longer than the TTL are dropped.
+_STATE_MAX_USERS = int(os.getenv("CHAT_UI_MAX_USERS", 1000))
+_STATE_TTL_SECONDS = float(os.getenv("CHAT_UI_STATE_TTL_SECONDS", 3600))
+_STATE = OrderedDict()  # sid -> (last_access, state)
+_STATE_LOCK = threading.Lock()
+
+
+def user_state():
+    sid = session.get('sid')
+    if sid is None:
+        sid = session['sid'] = secrets.token_hex(8)
+    now = time.monotonic()
+    with _STATE_LOCK:
+        # entries are kept in access order, so expired ones are at the front
+        while _STATE:
+            oldest_sid, (last_access, _) = next(iter(_STATE.items()))
+            if now - last_access < _STATE_TTL_SECONDS:
+                break
+            del _STATE[oldest_sid]
+        _, state = _STATE.pop(sid, (now, {}))
+        _STATE[sid] = (now, state)
+        while len(_STATE) > _STATE_MAX_USERS:
+            _STATE.popitem(last=False)
+    return state
+
 
 @app.route("/")
 def home():
@@ -20,82 +54,62 @@ def home():
 
 @app.route("/activities", methods=["GET"])
 def activities():
-    response = requests.get(url="http://127.0.0.1:8081/activities")
-    # gamesList = response.text
-    # transform response.text json array to a list of anker tags
-    games = json.loads(response.text)
-    gamesList = []
-    print(games)
-    for game in games:
-        print(game)
-        # url encode the game name
-        encoded_game = urllib.parse.quote(game)
-        print(encoded_game)
-
-        # game = urllib..urlencode(game)
-        gamesList.append(game)
-        # gamesList += "<a href='/activities/search?activity="+encoded_game+"'>"+game+"</a>"
-
-    # convert gamesList to html and store in session
-
-    # convert gamesList string to array
-    # gamesList = gamesList.split(",")
-    session['games'] = gamesList
+    response = _SESSION.get(url="http://127.0.0.1:8081/activities")
+    gamesList = orjson.loads(response.content)
+    state = user_state()
+    state['games'] = gamesList
     return render_template("index.html", outputGames=gamesList)
 
-    # return render_template("index.html", outputGames=response.text)
-
 
 @app.route("/activities/search", methods=["POST"])
 def activitiesSearch():
     input_prompt = request.form.get("input")
     activity = urllib.parse.quote(input_prompt.encode('UTF-8'))
-    print(activity)
-    response = requests.get(
+    response = _SESSION.get(
         url="http://127.0.0.1:8081/activities/search?activity="+activity)
-    json_object = json.loads(response.text)
-    outputGames = session['games']
-    session['gameInput'] = input_prompt
-    session['gamePrompt'] = json_object["prompt"]
+    json_object = orjson.loads(response.content)
+    state = user_state()
+    outputGames = state.get('games', [])
+    state['gameInput'] = input_prompt
+    state['gamePrompt'] = json_object["prompt"]
     return render_template("index.html", outputGamePrompt=json_object["prompt"], outputGames=outputGames, input_prompt=input_prompt)
 
 
 @app.route("/chat", methods=["POST"])
 def chat():
     input_prompt = request.form.get("inputGamePrompt")
-    print(input_prompt)
     paras = {"message": input_prompt}
-    response = requests.post(url="http://127.0.0.1:8081/chat", data=paras)
-    json_object = json.loads(response.text)
-    print(json_object)
+    response = _SESSION.post(url="http://127.0.0.1:8081/chat", data=paras)
+    json_object = orjson.loads(response.content)
+    state = user_state()
     chatGuid = json_object["guid"]
-    session['chatGuid'] = chatGuid
+    state['chatGuid'] = chatGuid
     chatContent = json_object["messages"][1]["content"]
-    game = session['gameInput']
-    outputGames = session['games']
-    session['chatContent'] = chatContent
+    game = state.get('gameInput', '')
+    outputGames = state.get('games', [])
+    state['chatContent'] = chatContent
     return render_template("index.html", outputChatGuid=chatGuid, outputChatContent=chatContent, outputGamePrompt=input_prompt, outputGames=outputGames, input_prompt=game)
 
 
 @app.route("/chat/guid", methods=["POST"])
 def chatGuid():
     input_prompt = request.form.get("inputGameInteraction")
-    print(input_prompt)
     paras = {"message": input_prompt}
-    chatGuid = session['chatGuid']
-    print(chatGuid)
-    response = requests.put(
+    state = user_state()
+    chatGuid = state.get('chatGuid')
+    if chatGuid is None:
+        # the stored chat was evicted or never started; show the page afresh
+        return render_template("index.html", outputGames=state.get('games', []))
+    response = _SESSION.put(
         url="http://127.0.0.1:8081/chat/"+chatGuid, data=paras)
-    json_object = json.loads(response.text)
-    session['chatGuid'] = chatGuid
-    print(json_object)
+    json_object = orjson.loads(response.content)
+    state['chatGuid'] = chatGuid
     msgLength = len(json_object["messages"])
     chatInteractionResult = json_object["messages"][msgLength-1]["content"]
-    outputGames = session['games']
-    input_prompt = session['gameInput']
-    chatContent = session['chatContent']
-    gameInput = session['gameInput']
-    gamePrompt = session['gamePrompt']
+    outputGames = state.get('games', [])
+    input_prompt = state.get('gameInput', '')
+    chatContent = state.get('chatContent', '')
+    gamePrompt = state.get('gamePrompt', '')
     return render_template("index.html", outputChatInteraction=chatInteractionResult, outputChatGuid=chatGuid, outputChatContent=chatContent, outputGamePrompt=gamePrompt, outputGames=outputGames, input_prompt=input_prompt)
 
 